@@ -1,46 +1,89 @@
 # LiveKit + Pipecat Demo Configuration
 
-# LiveKit Configuration
-# Option A: LiveKit Cloud (Recommended)
-# LIVEKIT_URL = "wss://your-project.livekit.cloud"
-# LIVEKIT_API_KEY = "your-api-key"
-# LIVEKIT_API_SECRET = "your-api-secret"
-
-# Option B: Local LiveKit Server (using docker-compose)
-LIVEKIT_URL = "ws://localhost:7880"
-LIVEKIT_API_KEY = "devkey"
-LIVEKIT_API_SECRET = "secret"
-
-# Load environment variables from .env file
 import os
+import random
+import string
+import time
+from dataclasses import dataclass
+
 from dotenv import load_dotenv
 
-# Load .env file from parent directory
-load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
+# .env file lives in the parent directory
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 
-# AI Service Configuration
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', 'your-openai-api-key')  # Set via environment variable
 
-# Cartesia TTS Configuration
-CARTESIA_API_KEY = os.getenv('CARTESIA_API_KEY', 'your-cartesia-api-key')  # Set via environment variable
-CARTESIA_VOICE_ID = "79a125e8-cd45-4c13-8a67-188112f4dd22"  # British Lady voice (default)
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Agent settings, loaded once at import and read-only afterwards"""
 
+    # LiveKit Configuration
+    livekit_url: str
+    livekit_api_key: str
+    livekit_api_secret: str
+
+    # AI Service Configuration
+    openai_api_key: str
+
+    # Cartesia TTS Configuration
+    cartesia_api_key: str
+    cartesia_voice_id: str
+
+    # Room Configuration
+    room_name: str
+
+    # Audio Configuration
+    sample_rate: int
+    channels: int
+
+    # Agent Behavior
+    echo_suffix: str
+    response_timeout: float  # seconds
+    barge_in_enabled: bool
+
+    # Logging
+    log_level: str  # DEBUG, INFO, WARNING, ERROR
+
+    @classmethod
+    def load(cls) -> "Config":
+        """Load environment variables from .env and build the config"""
+        load_dotenv(ENV_FILE)
+
+        return cls(
+            # Option A: LiveKit Cloud (Recommended)
+            # livekit_url="wss://your-project.livekit.cloud",
+            # livekit_api_key="your-api-key",
+            # livekit_api_secret="your-api-secret",
+
+            # Option B: Local LiveKit Server (using docker-compose)
+            livekit_url="ws://localhost:7880",
+            livekit_api_key="devkey",
+            livekit_api_secret="secret",
+
+            openai_api_key=os.getenv('OPENAI_API_KEY', 'your-openai-api-key'),  # Set via environment variable
+
+            cartesia_api_key=os.getenv('CARTESIA_API_KEY', 'your-cartesia-api-key'),  # Set via environment variable
+            cartesia_voice_id="79a125e8-cd45-4c13-8a67-188112f4dd22",  # British Lady voice (default)
+
+            room_name="pipecat-demo",
+
+            sample_rate=16000,
+            channels=1,
+
+            echo_suffix="...got it",
+            response_timeout=5.0,
+            barge_in_enabled=True,
+
+            log_level="INFO",
+        )
 
-# Room Configuration
-ROOM_NAME = "pipecat-demo"
-import random
-import string
-import time
-AGENT_NAME = f"PipecatAgent-{int(time.time())}-{''.join(random.choices(string.ascii_lowercase + string.digits, k=4))}"
 
-# Audio Configuration
-SAMPLE_RATE = 16000
-CHANNELS = 1
+CONFIG = Config.load()
 
-# Agent Behavior
-ECHO_SUFFIX = "...got it"
-RESPONSE_TIMEOUT = 5.0  # seconds
-BARGE_IN_ENABLED = True
 
-# Logging
-LOG_LEVEL = "INFO"  # DEBUG, INFO, WARNING, ERROR
+def __getattr__(name):
+    # AGENT_NAME is generated on first access, so importing config doesn't pay for it
+    if name == 'AGENT_NAME':
+        agent_name = f"PipecatAgent-{int(time.time())}-{''.join(random.choices(string.ascii_lowercase + string.digits, k=4))}"
+        globals()['AGENT_NAME'] = agent_name
+        return agent_name
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
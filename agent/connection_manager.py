@@ -7,110 +7,163 @@ by managing unique identities and cleaning up stale connections.
 """
 
 import asyncio
+import heapq
 import logging
 import time
 import random
 import string
 import os
-from typing import Optional, Dict, Any
+from collections import deque
+from typing import Optional, Dict, Any, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Must be a power of two: the ring index is masked rather than taken modulo
+SUFFIX_RING_SIZE = 1024
+
 class ConnectionManager:
     """Manages LiveKit connections to prevent participant conflicts"""
     
+    __slots__ = (
+        'active_connections', 'max_history', 'connection_history', '_history_index',
+        '_suffix_ring', '_suffix_idx', '_pid', '_age_heap', '_lock',
+    )
+    
     def __init__(self):
         self.active_connections: Dict[str, Any] = {}
-        self.connection_history: list = []
         self.max_history = 100
+        self.connection_history: deque = deque(maxlen=self.max_history)
+        # identity -> history entry, so status updates don't scan the history
+        self._history_index: Dict[str, dict] = {}
+        
+        # Pre-generated random suffixes, rotated through per identity
+        self._suffix_ring = [
+            ''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
+            for _ in range(SUFFIX_RING_SIZE)
+        ]
+        self._suffix_idx = 0
+        # Process ID to handle multiple instances
+        self._pid = os.getpid()
+        
+        # (connected_at, identity) min-heap for stale sweeps. Entries are
+        # removed lazily: unregistered identities are skipped when popped.
+        self._age_heap: List[Tuple[float, str]] = []
+        
+        # Guards active_connections, the age heap and history status updates.
+        # generate_unique_identity stays lock-free; it is sync and only appends.
+        self._lock = asyncio.Lock()
     
     def generate_unique_identity(self, prefix: str = "PipecatAgent") -> str:
         """Generate a truly unique participant identity"""
-        # Use nanosecond precision timestamp for maximum uniqueness
-        timestamp = time.time_ns()
-        
-        # Add random component for additional uniqueness
-        random_suffix = ''.join(random.choices(
-            string.ascii_lowercase + string.digits, k=8
-        ))
+        # Nanosecond timestamp plus a per-process counter; the counter alone
+        # guarantees uniqueness within this process
+        timestamp = time.monotonic_ns()
+        counter = self._suffix_idx
+        self._suffix_idx += 1
         
-        # Include process ID to handle multiple instances
-        process_id = os.getpid()
+        # Random component is cosmetic, it just makes identities easier to tell apart
+        random_suffix = self._suffix_ring[counter & (SUFFIX_RING_SIZE - 1)]
         
-        unique_identity = f"{prefix}-{timestamp}-{process_id}-{random_suffix}"
+        unique_identity = f"{prefix}-{timestamp}-{self._pid}-{counter}-{random_suffix}"
         
         # Store in history for debugging
-        self.connection_history.append({
-            'identity': unique_identity,
-            'created_at': time.time(),
-            'status': 'created'
-        })
-        
-        # Trim history
-        if len(self.connection_history) > self.max_history:
-            self.connection_history.pop(0)
+        self._record_history(unique_identity)
         
-        logger.info(f"🆔 Generated unique identity: {unique_identity}")
+        logger.info("🆔 Generated unique identity: %s", unique_identity)
         return unique_identity
     
-    def register_connection(self, identity: str, transport: Any) -> None:
-        """Register an active connection"""
-        self.active_connections[identity] = {
-            'transport': transport,
-            'connected_at': time.time(),
-            'status': 'active'
-        }
+    def _record_history(self, identity: str) -> None:
+        """Append a history entry, evicting the oldest once the deque is full"""
+        if len(self.connection_history) == self.max_history:
+            oldest = self.connection_history[0]
+            if self._history_index.get(oldest['identity']) is oldest:
+                del self._history_index[oldest['identity']]
         
-        # Update history
-        for entry in self.connection_history:
-            if entry['identity'] == identity:
+        entry = {
+            'identity': identity,
+            'created_at': time.time(),
+            'status': 'created'
+        }
+        self.connection_history.append(entry)
+        self._history_index[identity] = entry
+    
+    async def register_connection(self, identity: str, transport: Any) -> None:
+        """Register an active connection"""
+        async with self._lock:
+            # Monotonic so stale-connection ages are immune to wall-clock jumps
+            connected_at = time.monotonic()
+            self.active_connections[identity] = {
+                'transport': transport,
+                'connected_at': connected_at,
+                'status': 'active'
+            }
+            heapq.heappush(self._age_heap, (connected_at, identity))
+            
+            # Update history
+            entry = self._history_index.get(identity)
+            if entry is not None:
                 entry['status'] = 'connected'
-                break
         
-        logger.info(f"📝 Registered connection: {identity}")
+        logger.info("📝 Registered connection: %s", identity)
     
-    def unregister_connection(self, identity: str) -> None:
+    async def unregister_connection(self, identity: str) -> None:
         """Unregister a connection"""
-        if identity in self.active_connections:
+        async with self._lock:
+            if identity not in self.active_connections:
+                return
+            
             del self.active_connections[identity]
+            if not self.active_connections:
+                # Every heap entry is now a leftover; drop them instead of waiting for a sweep
+                self._age_heap.clear()
             
             # Update history
-            for entry in self.connection_history:
-                if entry['identity'] == identity:
-                    entry['status'] = 'disconnected'
-                    entry['disconnected_at'] = time.time()
-                    break
-            
-            logger.info(f"🗑️ Unregistered connection: {identity}")
+            entry = self._history_index.get(identity)
+            if entry is not None:
+                entry['status'] = 'disconnected'
+                entry['disconnected_at'] = time.time()
+        
+        logger.info("🗑️ Unregistered connection: %s", identity)
     
     async def cleanup_stale_connections(self, max_age_seconds: int = 300) -> None:
         """Clean up connections older than max_age_seconds"""
-        current_time = time.time()
+        cutoff = time.monotonic() - max_age_seconds
+        
+        # Heap top is the oldest connection time (or an older leftover), so
+        # if it hasn't aged out nothing has
+        if not self._age_heap or self._age_heap[0][0] >= cutoff:
+            return
+        
         stale_identities = []
         
-        for identity, connection_info in self.active_connections.items():
-            age = current_time - connection_info['connected_at']
-            if age > max_age_seconds:
-                stale_identities.append(identity)
+        async with self._lock:
+            # Only the entries old enough to be stale are ever popped
+            while self._age_heap and self._age_heap[0][0] < cutoff:
+                connected_at, identity = heapq.heappop(self._age_heap)
+                connection_info = self.active_connections.get(identity)
+                # Skip heap entries left behind by unregistered or re-registered identities
+                if connection_info is not None and connection_info['connected_at'] == connected_at:
+                    stale_identities.append(identity)
         
+        # Disconnect outside the lock; force_disconnect takes it again to unregister
         for identity in stale_identities:
-            logger.warning(f"🧹 Cleaning up stale connection: {identity}")
+            logger.warning("🧹 Cleaning up stale connection: %s", identity)
             await self.force_disconnect(identity)
     
     async def force_disconnect(self, identity: str) -> None:
         """Force disconnect a connection"""
-        if identity in self.active_connections:
-            connection_info = self.active_connections[identity]
+        connection_info = self.active_connections.get(identity)
+        if connection_info is not None:
             transport = connection_info.get('transport')
             
             if transport and hasattr(transport, 'disconnect'):
                 try:
                     await transport.disconnect()
-                    logger.info(f"✅ Force disconnected: {identity}")
+                    logger.info("✅ Force disconnected: %s", identity)
                 except Exception as e:
-                    logger.error(f"❌ Failed to force disconnect {identity}: {e}")
+                    logger.error("❌ Failed to force disconnect %s: %s", identity, e)
             
-            self.unregister_connection(identity)
+            await self.unregister_connection(identity)
     
     def get_connection_status(self) -> Dict[str, Any]:
         """Get current connection status"""
@@ -118,25 +171,28 @@ class ConnectionManager:
             'active_connections': len(self.active_connections),
             'connection_history_count': len(self.connection_history),
             'active_identities': list(self.active_connections.keys()),
-            'recent_history': self.connection_history[-10:]  # Last 10 entries
+            'recent_history': list(self.connection_history)[-10:]  # Last 10 entries
         }
     
     async def emergency_cleanup(self) -> None:
         """Emergency cleanup of all connections"""
         logger.warning("🚨 Performing emergency cleanup of all connections")
         
-        identities = list(self.active_connections.keys())
+        async with self._lock:
+            identities = list(self.active_connections.keys())
         for identity in identities:
             await self.force_disconnect(identity)
         
-        # Clear everything
-        self.active_connections.clear()
-        
-        # Mark all history entries as emergency cleaned
-        for entry in self.connection_history:
-            if entry.get('status') == 'active' or entry.get('status') == 'connected':
-                entry['status'] = 'emergency_cleanup'
-                entry['cleanup_at'] = time.time()
+        async with self._lock:
+            # Clear everything
+            self.active_connections.clear()
+            self._age_heap.clear()
+            
+            # Mark all history entries as emergency cleaned
+            for entry in self._history_index.values():
+                if entry.get('status') == 'active' or entry.get('status') == 'connected':
+                    entry['status'] = 'emergency_cleanup'
+                    entry['cleanup_at'] = time.time()
         
         logger.info("✅ Emergency cleanup completed")
 
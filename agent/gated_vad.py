@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Energy-Gated Silero VAD
+
+This module provides a SileroVADAnalyzer that skips the Silero model for
+audio windows that are clearly at the background noise level, which is
+most of the audio in an idle room.
+"""
+
+import math
+import logging
+
+import numpy as np
+from pipecat.audio.vad.silero import SileroVADAnalyzer
+
+# Numba is optional (pip install numba); without it the NumPy path is used
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+logger = logging.getLogger(__name__)
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _rms(samples: np.ndarray) -> float:
+        """Root-mean-square level of an int16 window, in one pass"""
+        acc = 0.0
+        for s in samples:
+            v = float(s)
+            acc += v * v
+        return math.sqrt(acc / samples.size)
+else:
+    def _rms(samples: np.ndarray) -> float:
+        """Root-mean-square level of an int16 window"""
+        x = samples.astype(np.float32)
+        return math.sqrt(float(np.dot(x, x)) / x.size)
+
+
+class GatedSileroVADAnalyzer(SileroVADAnalyzer):
+    """Silero VAD with an adaptive energy pre-filter
+
+    A noise floor is tracked as an EMA of window RMS. Windows quieter than
+    gate_ratio * noise_floor are scored 0.0 without running Silero. The floor
+    is only raised by windows Silero itself scored as non-speech and only
+    lowered by gated windows, so speech can't drag it upward.
+    """
+
+    def __init__(self, *, gate_ratio: float = 1.5, noise_alpha: float = 0.01,
+                 noise_confidence: float = 0.2, **kwargs):
+        super().__init__(**kwargs)
+        self._gate_ratio = gate_ratio
+        self._noise_alpha = noise_alpha
+        self._noise_confidence = noise_confidence
+        self._noise_floor = None
+
+    def voice_confidence(self, buffer) -> float:
+        rms = _rms(np.frombuffer(buffer, dtype=np.int16))
+        floor = self._noise_floor
+
+        if floor is not None and rms <= floor * self._gate_ratio:
+            # Clearly background noise: let the floor follow it down, skip the model
+            self._noise_floor = min(floor, self._ema(rms))
+            return 0.0
+
+        confidence = super().voice_confidence(buffer)
+        if confidence < self._noise_confidence:
+            # The floor is seeded from the first window Silero calls non-speech
+            self._noise_floor = rms if floor is None else self._ema(rms)
+        return confidence
+
+    def _ema(self, rms: float) -> float:
+        return self._noise_floor + self._noise_alpha * (rms - self._noise_floor)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Structured Log Events
+
+Per-turn agent events are logged as integer codes ("evt=<code> val=<value>")
+so the hot path doesn't build emoji strings. EventFormatter turns them back
+into human-readable lines for console output only.
+"""
+
+import logging
+from enum import IntEnum
+
+
+class Event(IntEnum):
+    """Event codes logged on the conversation hot path"""
+    USER_STARTED_SPEAKING = 1
+    USER_SPOKE = 2
+    LATENCY_MEASURED = 3
+    LATENCY_SENT = 4
+    RESPONSE_REQUESTED = 5
+    RESPONSE_READY = 6
+
+
+# Message formats used by callers: logger.info(EVENT_MSG, Event.X) / logger.info(EVENT_VALUE_MSG, Event.X, value)
+EVENT_MSG = "evt=%d"
+EVENT_VALUE_MSG = "evt=%d val=%s"
+
+# Human-readable templates, filled with the values that followed the event code
+EVENT_LABELS = {
+    Event.USER_STARTED_SPEAKING: "🎤🔥 USER STARTED SPEAKING - latency timer started",
+    Event.USER_SPOKE: "🎤📝 USER SPOKE: '%s'",
+    Event.LATENCY_MEASURED: "📊 LATENCY MEASURED: %.0fms (mouth-to-ear)",
+    Event.LATENCY_SENT: "📊 Latency data sent to UI: %.1fms",
+    Event.RESPONSE_REQUESTED: "🧠⚙️ Generating intelligent response with direct GPT-3.5-turbo call...",
+    Event.RESPONSE_READY: "🧠✅ GPT Response: '%s'",
+}
+
+
+class EventFormatter(logging.Formatter):
+    """Formatter that renders event-code records with their emoji label"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        args = record.args
+        if isinstance(args, tuple) and args and isinstance(args[0], Event):
+            # Copy so other handlers still see the structured record
+            record = logging.makeLogRecord(record.__dict__)
+            record.msg = EVENT_LABELS[args[0]]
+            record.args = args[1:]
+        return super().format(record)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Service Process Helpers
+
+Shared by the agent supervisor and the service manager: .env parsing,
+size-capped log files for child processes, and log write tracking.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+import time
+
+# watchfiles is optional (pip install watchfiles); without it callers fall back to mtime checks
+try:
+    from watchfiles import awatch
+except ImportError:
+    awatch = None
+
+logger = logging.getLogger(__name__)
+
+# KEY=value lines; comments and blank lines don't match. Only [ \t] is allowed
+# around '=', so an empty value can't run on into the next line.
+_ENV_RE = re.compile(rb'(?m)^[ \t]*([A-Za-z_][A-Za-z0-9_]*)[ \t]*=[ \t]*(.*?)[ \t\r]*$')
+
+# Child logs are rotated when opened once they grow past this size
+MAX_LOG_BYTES = 10 * 1024 * 1024
+
+
+def parse_env(path) -> dict:
+    """Parse a .env file into a dict in a single regex pass"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return {m.group(1).decode(): m.group(2).decode() for m in _ENV_RE.finditer(data)}
+
+
+def open_child_log(path):
+    """Open a log file to hand to a child process as stdout
+
+    Appends so history survives restarts. An oversized log is copied to
+    <path>.1 and truncated in place; keeping the inode means anything
+    watching the file keeps working. The child writes to the fd directly,
+    so no Python-side buffering is requested.
+    """
+    mode = 'ab'
+    try:
+        if os.stat(path).st_size > MAX_LOG_BYTES:
+            shutil.copyfile(path, f"{path}.1")
+            mode = 'wb'
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"⚠️ Could not rotate {path}: {e}")
+        mode = 'wb'
+    return open(path, mode)
+
+
+async def track_writes(path, record):
+    """Call record(timestamp) whenever path is written, using filesystem events
+
+    Seeds with the file's current mtime. If the watcher fails, record(None)
+    is called so the caller can fall back to stat-based checks. Requires
+    watchfiles (awatch is not None).
+    """
+    try:
+        record(os.stat(path).st_mtime)
+        async for _ in awatch(path):
+            record(time.time())
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"⚠️ Log watcher for {path} stopped, falling back to mtime checks: {e}")
+    record(None)
@@ -23,69 +23,118 @@ import logging
 import signal
 import sys
 import os
+import re
 import time
-import jwt
+import base64
+import struct
+import traceback
 from typing import Optional
 
+# libuv-based event loop when available (not supported on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 # Add current directory to path for config import
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    import config
+    from config import CONFIG
 except ImportError:
     print("❌ config.py not found. Please copy config.py.template to config.py and configure your credentials.")
     sys.exit(1)
 
-# Configure logging
+from connection_manager import connection_manager
+from log_events import Event, EventFormatter, EVENT_MSG, EVENT_VALUE_MSG
+
+# Configure logging; event-code records are rendered readable on the console
+console_handler = logging.StreamHandler()
+console_handler.setFormatter(EventFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 logging.basicConfig(
-    level=getattr(logging, config.LOG_LEVEL),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    level=getattr(logging, CONFIG.log_level),
+    handlers=[console_handler]
 )
 logger = logging.getLogger(__name__)
 
+# The log format doesn't use thread or multiprocessing fields, so skip collecting them
+logging.logThreads = False
+logging.logMultiprocessing = False
+
 # Check if we have the required packages
 try:
-    from pipecat.frames.frames import Frame, AudioRawFrame, TextFrame, StartFrame
+    from pipecat.audio.vad.vad_analyzer import VADParams
+    from pipecat.frames.frames import (
+        Frame, BotStartedSpeakingFrame, TextFrame, TransportMessageFrame, UserStartedSpeakingFrame
+    )
     from pipecat.pipeline.pipeline import Pipeline
     from pipecat.pipeline.runner import PipelineRunner
     from pipecat.pipeline.task import PipelineTask
+    from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
     from pipecat.services.openai.stt import OpenAISTTService
     from pipecat.services.openai.tts import OpenAITTSService
-    from pipecat.frames.frames import AudioRawFrame
     from pipecat.transports.livekit.transport import LiveKitTransport, LiveKitParams
-    from pipecat.processors.aggregators.openai_llm_context import OpenAILLMContext
-    from pipecat.processors.frame_processor import FrameDirection, FrameProcessor
-    from pipecat.audio.vad.silero import SileroVADAnalyzer
-    from pipecat.audio.vad.vad_analyzer import VADParams
+    from gated_vad import GatedSileroVADAnalyzer
+    from livekit import api
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 
     logger.info("✅ Pipecat imports successful")
 
 except ImportError as e:
-    logger.error(f"❌ Failed to import Pipecat: {e}")
+    logger.error("❌ Failed to import Pipecat: %s", e)
     logger.error("Please install Pipecat: pip install pipecat-ai")
     sys.exit(1)
 
 
+# Agent grants never change; AccessToken only reads them when signing, so one instance is shared
+AGENT_GRANTS = api.VideoGrants(
+    room_join=True,
+    room=CONFIG.room_name,
+    can_publish=True,
+    can_subscribe=True
+)
+
+# Resolved once; used for every frame this agent originates
+DOWNSTREAM = FrameDirection.DOWNSTREAM
+
+# Conversation messages kept alongside the system prompt
+MAX_HISTORY_MESSAGES = 10
+
+# Streamed responses are sent to TTS at sentence ends, or after this many words
+SENTENCE_END = re.compile(r'[.!?]\s*$')
+MAX_SPOKEN_CHUNK_WORDS = 20
+
+# Latency update packet: type tag (u8), latency_ms (f32), timestamp (f64), response_count (u32)
+LATENCY_PACKET = struct.Struct('<BfdI')
+LATENCY_PACKET_TYPE = 1
+
+# Warm-up must never hold up joining the room for long
+WARM_UP_TIMEOUT = 2.0  # seconds
+
+# httpx drops idle connections after 5s by default, which would discard the warmed
+# connection before the first user turn; keep the LLM client's pool alive longer
+OPENAI_KEEPALIVE_EXPIRY = 120.0  # seconds
+
+# Sentinel for frame classes whose handler hasn't been looked up yet
+_UNRESOLVED = object()
+
+# In-flight runner.cancel() tasks started by request_shutdown
+_shutdown_tasks = set()
+
+
 def generate_access_token():
     """Generate a LiveKit access token for the agent with unique identity"""
-    from livekit import api
-    from connection_manager import connection_manager
-    
     # Use connection manager to generate truly unique identity
     unique_identity = connection_manager.generate_unique_identity("PipecatAgent")
     
-    logger.info(f"🆔 Generating token for unique agent identity: {unique_identity}")
+    logger.info("🆔 Generating token for unique agent identity: %s", unique_identity)
     
     # Create access token with unique identity
-    token = api.AccessToken(config.LIVEKIT_API_KEY, config.LIVEKIT_API_SECRET) \
+    token = api.AccessToken(CONFIG.livekit_api_key, CONFIG.livekit_api_secret) \
         .with_identity(unique_identity) \
         .with_name(unique_identity) \
-        .with_grants(api.VideoGrants(
-            room_join=True,
-            room=config.ROOM_NAME,
-            can_publish=True,
-            can_subscribe=True
-        ))
+        .with_grants(AGENT_GRANTS)
 
     return token.to_jwt(), unique_identity
 
@@ -97,13 +146,28 @@ def generate_access_token():
 class IntelligentProcessor(FrameProcessor):
     """Intelligent processor with OpenAI GPT-3.5-turbo and latency measurement"""
 
+    __slots__ = (
+        'openai_api_key', 'transport', 'speech_start_time', 'waiting_for_tts_audio',
+        'response_count', '_openai', '_messages', '_pack_latency',
+        '_handlers', '_handler_cache', '_pending_tasks',
+    )
+
     def __init__(self, openai_api_key, transport):
         super().__init__()
         self.openai_api_key = openai_api_key
         self.transport = transport
+        # One client for the whole session so its HTTP connection pool stays warm,
+        # and a stalled request can't hold up the turn
+        self._openai = AsyncOpenAI(
+            api_key=openai_api_key,
+            timeout=CONFIG.response_timeout,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100,
+                                    keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY)
+            )
+        )
         self.speech_start_time = None
         self.waiting_for_tts_audio = False
-        self.conversation_history = []
         self.response_count = 0
         
         # Add system prompt for intelligent conversation
@@ -112,142 +176,256 @@ class IntelligentProcessor(FrameProcessor):
             "Keep your responses concise (1-2 sentences), engaging, and contextually relevant. "
             "Be conversational and helpful."
         )
-        self.conversation_history.append({"role": "system", "content": system_prompt})
+        # System prompt followed by the last MAX_HISTORY_MESSAGES conversation messages.
+        # Trimmed in place and handed to the API as-is, so no list is rebuilt per turn.
+        self._messages = [{"role": "system", "content": system_prompt}]
+        
+        self._pack_latency = LATENCY_PACKET.pack
+        # Strong refs to fire-and-forget telemetry tasks until they finish
+        self._pending_tasks = set()
+        
+        # Frame class -> handler; anything not listed is passed straight through
+        self._handlers = {
+            UserStartedSpeakingFrame: self._on_user_started_speaking,
+            TextFrame: self._on_text,
+            BotStartedSpeakingFrame: self._on_bot_started_speaking,
+        }
+        self._handler_cache = {}
         
         logger.info("🧠 IntelligentProcessor initialized with direct GPT-3.5-turbo calls")
         logger.info("📊 Latency measurement enabled")
 
     async def process_frame(self, frame: Frame, direction: FrameDirection):
         """Process incoming frames with intelligent LLM responses and latency measurement"""
-        frame_type = frame.__class__.__name__
-        
         # Let parent handle the frame first
         await super().process_frame(frame, direction)
         
-        # Track when user starts speaking for latency measurement
-        if 'UserStartedSpeaking' in frame_type:
-            self.speech_start_time = time.time()
-            self.waiting_for_tts_audio = True
-            logger.info("🎤🔥 USER STARTED SPEAKING - latency timer started")
+        handler = self._handler_cache.get(type(frame), _UNRESOLVED)
+        if handler is _UNRESOLVED:
+            handler = self._resolve_handler(type(frame))
         
-        # Process text input from STT
-        if isinstance(frame, TextFrame):
-            user_text = frame.text.strip()
-            logger.info(f"🎤📝 USER SPOKE: '{user_text}'")
-            
-            if user_text:
-                await self._generate_intelligent_response(user_text)
-            else:
-                # Handle empty input
-                response_frame = TextFrame("I didn't catch that. Could you repeat?")
-                await self.push_frame(response_frame, FrameDirection.DOWNSTREAM)
+        if handler is not None:
+            await handler(frame, direction)
+        else:
+            # Pass all other frames downstream
+            await self.push_frame(frame, direction)
+    
+    def _resolve_handler(self, frame_cls):
+        """Find the handler for a frame class via its MRO and cache the result
         
-        # Measure latency when TTS audio starts playing
-        elif isinstance(frame, AudioRawFrame) and self.waiting_for_tts_audio and self.speech_start_time:
-            end_time = time.time()
-            latency_ms = (end_time - self.speech_start_time) * 1000
-            
-            logger.info(f"📊 LATENCY MEASURED: {latency_ms:.0f}ms (mouth-to-ear)")
-            
-            # Send latency data to UI via data channel
-            await self._send_latency_to_ui(latency_ms)
-            
-            # Reset latency tracking
-            self.waiting_for_tts_audio = False
-            self.speech_start_time = None
+        Pipecat emits subclasses (e.g. TranscriptionFrame for TextFrame), so
+        an exact type lookup alone isn't enough; the MRO walk happens once per class.
+        """
+        handler = next(
+            (self._handlers[cls] for cls in frame_cls.__mro__ if cls in self._handlers),
+            None
+        )
+        self._handler_cache[frame_cls] = handler
+        return handler
+    
+    async def _on_user_started_speaking(self, frame: Frame, direction: FrameDirection):
+        """Track when user starts speaking for latency measurement"""
+        self.speech_start_time = time.monotonic_ns()
+        self.waiting_for_tts_audio = True
+        logger.info(EVENT_MSG, Event.USER_STARTED_SPEAKING)
+        await self.push_frame(frame, direction)
+    
+    async def _on_text(self, frame: TextFrame, direction: FrameDirection):
+        """Process text input from STT"""
+        user_text = frame.text.strip()
+        logger.info(EVENT_VALUE_MSG, Event.USER_SPOKE, user_text)
         
-        # Pass all other frames downstream
-        elif not isinstance(frame, TextFrame):
+        if user_text:
+            await self._generate_intelligent_response(user_text)
+        else:
+            # Handle empty input
+            response_frame = TextFrame("I didn't catch that. Could you repeat?")
+            await self.push_frame(response_frame, DOWNSTREAM)
+    
+    async def _on_bot_started_speaking(self, frame: BotStartedSpeakingFrame, direction: FrameDirection):
+        """Measure latency when TTS audio starts playing
+        
+        The output transport pushes BotStartedSpeakingFrame upstream once playback
+        begins, so this fires once per response; audio frames need no inspection.
+        """
+        if not self.waiting_for_tts_audio or self.speech_start_time is None:
             await self.push_frame(frame, direction)
+            return
+        
+        # Integer nanoseconds until the final division keeps the delta exact
+        end_time = time.monotonic_ns()
+        latency_ms = (end_time - self.speech_start_time) / 1_000_000
+        
+        logger.info(EVENT_VALUE_MSG, Event.LATENCY_MEASURED, latency_ms)
+        
+        # Send latency data to UI via data channel, off the frame path
+        task = asyncio.create_task(self._send_latency_to_ui(latency_ms))
+        self._pending_tasks.add(task)
+        task.add_done_callback(self._pending_tasks.discard)
+        
+        # Reset latency tracking
+        self.waiting_for_tts_audio = False
+        self.speech_start_time = None
+        
+        await self.push_frame(frame, direction)
+    
+    def _append_message(self, role: str, content: str):
+        """Add a message to the conversation history, dropping the oldest past the limit"""
+        self._messages.append({"role": role, "content": content})
+        overflow = len(self._messages) - 1 - MAX_HISTORY_MESSAGES
+        if overflow > 0:
+            del self._messages[1:1 + overflow]
     
     async def _generate_intelligent_response(self, user_text: str):
         """Generate intelligent response using direct OpenAI GPT-3.5-turbo API call"""
+        self.response_count += 1
+        
+        # Add user message to conversation history
+        self._append_message("user", user_text)
+        
+        logger.info(EVENT_MSG, Event.RESPONSE_REQUESTED)
+        
+        spoken = []
         try:
-            self.response_count += 1
-            
-            # Add user message to conversation history
-            self.conversation_history.append({"role": "user", "content": user_text})
-            
-            # Keep conversation history manageable (last 10 messages)
-            if len(self.conversation_history) > 11:  # 1 system + 10 conversation messages
-                # Keep system message and last 8 messages
-                self.conversation_history = [self.conversation_history[0]] + self.conversation_history[-8:]
-            
-            logger.info(f"🧠⚙️ Generating intelligent response with direct GPT-3.5-turbo call...")
-            
-            # Make direct OpenAI API call
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.openai_api_key)
-            
-            response = await client.chat.completions.create(
+            # Stream the completion and hand each sentence to TTS as soon as it ends,
+            # so speech starts while the rest of the response is still generating
+            stream = await self._openai.chat.completions.create(
                 model="gpt-3.5-turbo",
-                messages=self.conversation_history,
+                messages=self._messages,
                 max_tokens=100,
-                temperature=0.7
+                temperature=0.7,
+                stream=True
             )
             
-            ai_response = response.choices[0].message.content.strip()
-            
-            # Add AI response to conversation history
-            self.conversation_history.append({"role": "assistant", "content": ai_response})
-            
-            logger.info(f"🧠✅ GPT Response: '{ai_response}'")
-            
-            # Send the intelligent response to TTS
-            response_frame = TextFrame(ai_response)
-            await self.push_frame(response_frame, FrameDirection.DOWNSTREAM)
-            
+            # The context manager releases the pooled connection even when interrupted
+            async with stream:
+                pending = ""
+                async for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    token = chunk.choices[0].delta.content
+                    if not token:
+                        continue
+                    
+                    pending += token
+                    if SENTENCE_END.search(pending) or pending.count(' ') >= MAX_SPOKEN_CHUNK_WORDS:
+                        spoken.append(pending)
+                        await self.push_frame(TextFrame(pending.strip()), DOWNSTREAM)
+                        pending = ""
+                
+                if pending.strip():
+                    spoken.append(pending)
+                    await self.push_frame(TextFrame(pending.strip()), DOWNSTREAM)
+        
+        except asyncio.CancelledError:
+            # Barge-in: keep what the user already heard, then let the interruption proceed.
+            # If nothing was spoken the user turn stays unanswered, and the interrupting
+            # utterance simply follows it as the next user message.
+            if spoken:
+                self._append_message("assistant", "".join(spoken).strip())
+            raise
         except Exception as e:
-            logger.error(f"❌ Failed to generate intelligent response: {e}")
-            # Fallback to simple response
-            fallback_response = f"I understand you said '{user_text}'. Could you tell me more?"
-            response_frame = TextFrame(fallback_response)
-            await self.push_frame(response_frame, FrameDirection.DOWNSTREAM)
+            logger.error("❌ Failed to generate intelligent response: %s", e)
+        
+        # Add AI response (possibly partial, if the stream failed midway) to conversation history
+        ai_response = "".join(spoken).strip()
+        if ai_response:
+            self._append_message("assistant", ai_response)
+            logger.info(EVENT_VALUE_MSG, Event.RESPONSE_READY, ai_response)
+            return
+        
+        # Nothing reached TTS (request failed or GPT replied with nothing): fallback to simple response
+        fallback_response = f"I understand you said '{user_text}'. Could you tell me more?"
+        self._append_message("assistant", fallback_response)
+        response_frame = TextFrame(fallback_response)
+        await self.push_frame(response_frame, DOWNSTREAM)
+    
+    @property
+    def openai_client(self) -> AsyncOpenAI:
+        """OpenAI client used for chat completions"""
+        return self._openai
+    
+    async def aclose(self):
+        """Close the OpenAI client and its connection pool"""
+        await self._openai.close()
     
     async def _send_latency_to_ui(self, latency_ms: float):
         """Send latency metrics to the UI via LiveKit data channel"""
         try:
-            from pipecat.frames.frames import TransportMessageFrame
-            import json
-            
-            latency_data = {
-                "type": "latency_update",
-                "latency_ms": round(latency_ms, 1),
-                "timestamp": time.time(),
-                "response_count": self.response_count
-            }
+            # Pack a fixed-size binary packet; the transport sends text, so base64 it
+            packet = self._pack_latency(LATENCY_PACKET_TYPE, latency_ms, time.time(), self.response_count)
+            message = base64.b64encode(packet).decode('ascii')
             
-            # Convert to JSON string for transport
-            message_json = json.dumps(latency_data)
+            # Send via transport message frame (data channel). Frames are not pooled:
+            # each gets a unique id and may still be queued downstream after push_frame returns.
+            message_frame = TransportMessageFrame(message=message)
+            await self.push_frame(message_frame, DOWNSTREAM)
             
-            # Send via transport message frame (data channel)
-            message_frame = TransportMessageFrame(message=message_json)
-            await self.push_frame(message_frame, FrameDirection.DOWNSTREAM)
-            
-            logger.info(f"📊 Latency data sent to UI: {latency_ms:.1f}ms")
+            logger.info(EVENT_VALUE_MSG, Event.LATENCY_SENT, latency_ms)
             
         except Exception as e:
-            logger.warning(f"⚠️ Failed to send latency data to UI: {e}")
+            logger.warning("⚠️ Failed to send latency data to UI: %s", e)
+
+
+
+def pipecat_openai_client(service) -> Optional[AsyncOpenAI]:
+    """AsyncOpenAI client held by a pipecat OpenAI service, if it can be found
+    
+    Pipecat has no public accessor. In pipecat-ai 0.0.84 both OpenAISTTService
+    (via BaseWhisperSTTService) and OpenAITTSService keep it in the private
+    `_client` attribute; re-check this when upgrading. Anything else yields None,
+    so warm-up skips the service instead of failing.
+    """
+    client = getattr(service, '_client', None)
+    return client if isinstance(client, AsyncOpenAI) else None
+
 
+async def warm_up_openai_connections(clients):
+    """Issue one cheap request per OpenAI client so its connection pool is warm
+    
+    Takes (client, model) pairs; clients that are None are skipped. Failures and
+    timeouts are logged and ignored, since warm-up is only an optimization. Only the
+    LLM client keeps its connection for OPENAI_KEEPALIVE_EXPIRY; pipecat's STT/TTS
+    clients use httpx's 5s keep-alive, so theirs only helps if the user speaks quickly.
+    """
+    pending = [client.models.retrieve(model) for client, model in clients if client is not None]
+    if not pending:
+        return
+    
+    try:
+        results = await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), WARM_UP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("⚠️ OpenAI connection warm-up timed out after %.1fs", WARM_UP_TIMEOUT)
+        return
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        logger.warning("⚠️ OpenAI connection warm-up failed for %d client(s): %s", len(failures), failures[0])
+    else:
+        logger.info("🔥 Warmed up %d OpenAI connection(s)", len(results))
 
 
 async def main():
     """Main function to start the agent"""
     logger.info("🤖 Starting LiveKit + Pipecat Demo Agent")
-    
-    from connection_manager import connection_manager
+
+    if CONFIG.log_level == "DEBUG":
+        # Warn about anything that blocks the event loop for more than 50ms
+        loop = asyncio.get_running_loop()
+        loop.set_debug(True)
+        loop.slow_callback_duration = 0.05
 
     # Validate configuration
-    if not config.OPENAI_API_KEY or config.OPENAI_API_KEY == "your-openai-api-key":
+    if not CONFIG.openai_api_key or CONFIG.openai_api_key == "your-openai-api-key":
         logger.error("❌ Please set your OpenAI API key in config.py")
         return
 
-    if not config.LIVEKIT_URL or not config.LIVEKIT_API_KEY or not config.LIVEKIT_API_SECRET:
+    if not CONFIG.livekit_url or not CONFIG.livekit_api_key or not CONFIG.livekit_api_secret:
         logger.error("❌ Please set your LiveKit credentials in config.py")
         return
 
     transport = None
     unique_identity = None
+    intelligent_processor = None
     
     try:
         # Clean up any stale connections first
@@ -256,18 +434,18 @@ async def main():
         # Generate access token with unique identity
         token, unique_identity = generate_access_token()
         
-        logger.info(f"🔗 Connecting with identity: {unique_identity}")
+        logger.info("🔗 Connecting with identity: %s", unique_identity)
         
         # Initialize transport with VAD and unique identity
         transport = LiveKitTransport(
-            url=config.LIVEKIT_URL,
+            url=CONFIG.livekit_url,
             token=token,
-            room_name=config.ROOM_NAME,
+            room_name=CONFIG.room_name,
             params=LiveKitParams(
                 participant_name=unique_identity,  # Use unique identity
                 audio_in_enabled=True,
                 audio_out_enabled=True,
-                vad_analyzer=SileroVADAnalyzer(
+                vad_analyzer=GatedSileroVADAnalyzer(
                     params=VADParams(
                         stop_secs=1.0,   # Normal speech completion detection  
                         start_secs=0.2,   # Normal speech detection
@@ -279,12 +457,12 @@ async def main():
         )
         
         # Register the transport with connection manager
-        connection_manager.register_connection(unique_identity, transport)
+        await connection_manager.register_connection(unique_identity, transport)
 
         # Initialize STT service
         logger.info("🎤 Initializing OpenAI STT service...")
         stt = OpenAISTTService(
-            api_key=config.OPENAI_API_KEY,
+            api_key=CONFIG.openai_api_key,
             model="whisper-1",
         )
         logger.info("✅ OpenAI STT service initialized")
@@ -292,15 +470,22 @@ async def main():
         # Initialize OpenAI TTS service with complete response processing
         logger.info("🔊 Initializing OpenAI TTS service...")
         tts = OpenAITTSService(
-            api_key=config.OPENAI_API_KEY,
+            api_key=CONFIG.openai_api_key,
             voice="alloy",
             model="tts-1",
-            aggregate_sentences=False  # Process complete text without sentence splitting
+            aggregate_sentences=False  # IntelligentProcessor already sends one sentence per frame
         )
         logger.info("✅ OpenAI TTS service initialized")
 
         # Initialize our intelligent processor with direct OpenAI API calls
-        intelligent_processor = IntelligentProcessor(config.OPENAI_API_KEY, transport)
+        intelligent_processor = IntelligentProcessor(CONFIG.openai_api_key, transport)
+
+        # Bring up TLS sessions to OpenAI before the first user turn needs them
+        await warm_up_openai_connections([
+            (intelligent_processor.openai_client, "gpt-3.5-turbo"),
+            (pipecat_openai_client(stt), "whisper-1"),
+            (pipecat_openai_client(tts), "tts-1"),
+        ])
 
         # Create simplified pipeline - IntelligentProcessor handles GPT directly
         pipeline = Pipeline([
@@ -316,29 +501,51 @@ async def main():
         # Create and run the task
         task = PipelineTask(pipeline)
 
-        logger.info(f"🚀 Agent connecting to room: {config.ROOM_NAME} as {unique_identity}")
+        logger.info("🚀 Agent connecting to room: %s as %s", CONFIG.room_name, unique_identity)
         logger.info("🧠 Ready for intelligent conversation with OpenAI GPT-3.5-turbo")
         logger.info("🎵 Using OpenAI TTS for reliable, complete audio responses")
         logger.info("🎯 Target: Intelligent responses with complete audio playback")
 
-        # Run the pipeline
-        runner = PipelineRunner()
+        # Run the pipeline; SIGINT/SIGTERM cancel it between loop iterations so
+        # pending tasks and open connections are torn down instead of leaked
+        runner = PipelineRunner(handle_sigint=False)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, request_shutdown, runner)
+            except NotImplementedError:
+                # Windows event loops don't support signal handlers; Ctrl+C still raises KeyboardInterrupt
+                pass
+
         await runner.run(task)
+        await cleanup_transport(transport, unique_identity, intelligent_processor)
 
     except KeyboardInterrupt:
         logger.info("👋 Agent stopped by user")
-        await cleanup_transport(transport, unique_identity)
+        await cleanup_transport(transport, unique_identity, intelligent_processor)
     except Exception as e:
-        logger.error(f"❌ Agent failed: {e}")
-        import traceback
+        logger.error("❌ Agent failed: %s", e)
         traceback.print_exc()
-        await cleanup_transport(transport, unique_identity)
+        await cleanup_transport(transport, unique_identity, intelligent_processor)
         sys.exit(1)
 
 
-async def cleanup_transport(transport, unique_identity=None):
+def request_shutdown(runner):
+    """Signal handler: cancel the pipeline runner from inside the event loop"""
+    logger.info("Received shutdown signal, cleaning up...")
+    task = asyncio.create_task(runner.cancel())
+    # Keep a reference so the cancel task isn't garbage collected mid-flight
+    _shutdown_tasks.add(task)
+    task.add_done_callback(_shutdown_tasks.discard)
+
+
+async def cleanup_transport(transport, unique_identity=None, processor=None):
     """Clean up LiveKit transport connection"""
-    from connection_manager import connection_manager
+    if processor:
+        try:
+            await processor.aclose()
+        except Exception as e:
+            logger.warning("⚠️ Failed to close OpenAI client: %s", e)
     
     if transport:
         try:
@@ -346,7 +553,7 @@ async def cleanup_transport(transport, unique_identity=None):
             
             # Unregister from connection manager first
             if unique_identity:
-                connection_manager.unregister_connection(unique_identity)
+                await connection_manager.unregister_connection(unique_identity)
             
             # Disconnect from room
             if hasattr(transport, 'disconnect'):
@@ -355,24 +562,19 @@ async def cleanup_transport(transport, unique_identity=None):
             logger.info("✅ Transport cleanup completed")
             
         except Exception as e:
-            logger.warning(f"⚠️ Transport cleanup failed: {e}")
+            logger.warning("⚠️ Transport cleanup failed: %s", e)
             
             # Emergency cleanup if normal cleanup fails
             if unique_identity:
                 try:
                     await connection_manager.force_disconnect(unique_identity)
                 except Exception as cleanup_error:
-                    logger.error(f"❌ Emergency cleanup failed: {cleanup_error}")
+                    logger.error("❌ Emergency cleanup failed: %s", cleanup_error)
 
 
 if __name__ == "__main__":
-    # Handle graceful shutdown
-    def signal_handler(signum, frame):
-        logger.info("Received shutdown signal, cleaning up...")
-        sys.exit(0)
-
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-
     # Run the async main function
-    asyncio.run(main())
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
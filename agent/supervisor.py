@@ -24,8 +24,11 @@ import os
 import time
 import logging
 import psutil
+from collections import deque
 from pathlib import Path
 
+from service_utils import awatch, open_child_log, parse_env, track_writes
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -37,6 +40,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# On Linux RSS is read straight from /proc/<pid>/statm; elsewhere psutil is used
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if sys.platform.startswith('linux') else None
+
+def _fast_rss_mb(pid):
+    """Resident set size of a process in MB, from /proc/<pid>/statm"""
+    try:
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            rss_pages = int(f.read().split()[1])
+    except FileNotFoundError:
+        raise psutil.NoSuchProcess(pid)
+    return rss_pages * _PAGE_SIZE / 1048576
+
 class AgentSupervisor:
     def __init__(self):
         self.agent_process = None
@@ -45,110 +60,226 @@ class AgentSupervisor:
         self.restart_delay = 1  # Start with 1 second delay
         self.max_restart_delay = 60  # Maximum 60 seconds delay
         self.last_restart_time = 0
+        self._restart_times = deque(maxlen=128)  # time.monotonic_ns() of recent restarts
+        self.crash_loop_window = 300  # Treat more than crash_loop_restarts restarts in 5 minutes...
+        self.crash_loop_restarts = 5  # ...as a crash loop and back off to max_restart_delay
         self.is_shutting_down = False
+        self._ps_proc = None  # psutil handle for the running agent, reused across health checks
+        self._log_fd = None  # agent stdout/stderr log, owned by the supervisor
         
         # Agent configuration
         self.agent_script = Path(__file__).parent / "spawn_agent.py"
         self.log_file = "/tmp/pipecat_agent.log"
+        self.pid_file = Path("/tmp/pipecat_agent.pid")
         self.env_file = Path(__file__).parent.parent / ".env"
+        self._env_cache = {}  # parsed .env contents, reused across restarts
+        self._env_mtime = None
         
         # Health check parameters
-        self.health_check_interval = 30  # Check every 30 seconds
+        self.min_health_check_interval = 5  # Check every 5 seconds after a failure...
+        self.max_health_check_interval = 60  # ...backing off to once a minute while healthy
+        self._health_check_interval = self.min_health_check_interval
         self.max_memory_mb = 500  # Restart if memory usage > 500MB
         self.max_silent_time = 120  # Restart if no log activity for 2 minutes
+        self._last_log_activity = None  # updated via track_writes when watchfiles is available
+        self._log_watch_task = None
+        self._restart_q = asyncio.Queue(maxsize=1)  # at most one pending restart
+        self._pidfd = None  # pidfd of the running agent, readable once it exits (Linux 5.3+)
+        self._agent_dead = False
         
     def load_environment(self):
-        """Load environment variables from .env file"""
-        if self.env_file.exists():
-            with open(self.env_file) as f:
-                for line in f:
-                    if line.strip() and not line.startswith('#'):
-                        key, value = line.strip().split('=', 1)
-                        os.environ[key] = value
-            logger.info(f"✅ Environment loaded from {self.env_file}")
-        else:
+        """Load environment variables from .env file, re-parsing only when it changed"""
+        try:
+            mtime = self.env_file.stat().st_mtime
+        except FileNotFoundError:
             logger.warning(f"⚠️ Environment file not found: {self.env_file}")
+            return
+        
+        if mtime != self._env_mtime:
+            self._env_cache = parse_env(self.env_file)
+            self._env_mtime = mtime
+            logger.info(f"✅ Environment loaded from {self.env_file}")
+        os.environ.update(self._env_cache)
     
-    def start_agent(self):
+    async def start_agent(self):
         """Start the Pipecat agent process"""
         try:
             # Load environment variables
             self.load_environment()
             
             # Kill any existing agent processes
-            self.kill_existing_agents()
+            await self.kill_existing_agents()
             
             # Start new agent process
             logger.info(f"🚀 Starting agent: {self.agent_script}")
             
+            # The supervisor owns the log handle and closes it on restart/shutdown
+            self._close_log()
+            self._log_fd = open_child_log(self.log_file)
+            
             self.agent_process = subprocess.Popen(
                 [sys.executable, str(self.agent_script)],
-                stdout=open(self.log_file, 'w'),
+                stdout=self._log_fd,
                 stderr=subprocess.STDOUT,
                 cwd=str(self.agent_script.parent),
-                env=os.environ.copy()
+                env=os.environ.copy(),
+                start_new_session=True  # own process group, so killpg reaches its children too
             )
             
+            self._ps_proc = psutil.Process(self.agent_process.pid)
+            self.pid_file.write_text(str(self.agent_process.pid))
+            self._watch_agent()
+            
             logger.info(f"✅ Agent started with PID: {self.agent_process.pid}")
             self.last_restart_time = time.time()
+            # The log is appended to, so its mtime isn't reset by a spawn; give the new
+            # agent a full max_silent_time before inactivity counts against it
+            if self._last_log_activity is not None:
+                self._last_log_activity = self.last_restart_time
             return True
             
         except Exception as e:
             logger.error(f"❌ Failed to start agent: {e}")
             return False
     
-    def kill_existing_agents(self):
-        """Kill any existing agent processes"""
+    def _watch_agent(self):
+        """Get woken by the event loop as soon as the agent exits, instead of polling"""
+        self._agent_dead = False
+        pidfd_open = getattr(os, 'pidfd_open', None)
+        if pidfd_open is None:
+            return  # Not Linux: health checks fall back to poll()
         try:
-            # Find and kill existing spawn_agent.py processes
-            for proc in psutil.process_iter(['pid', 'name', 'cmdline']):
+            self._pidfd = pidfd_open(self.agent_process.pid)
+            asyncio.get_running_loop().add_reader(self._pidfd, self._on_agent_death)
+        except (OSError, RuntimeError, NotImplementedError) as e:
+            logger.debug(f"pidfd watch unavailable, using poll(): {e}")
+            if self._pidfd is not None:
+                os.close(self._pidfd)
+                self._pidfd = None
+    
+    def _unwatch_agent(self):
+        """Stop watching the agent's pidfd, if any"""
+        if self._pidfd is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._pidfd)
+        except RuntimeError:
+            pass  # Loop already gone
+        os.close(self._pidfd)
+        self._pidfd = None
+    
+    def _on_agent_death(self):
+        """pidfd became readable: the agent process has exited"""
+        self._unwatch_agent()
+        self._agent_dead = True
+        logger.warning("⚠️ Agent process has terminated")
+        self.request_restart("Agent process exited")
+    
+    def _close_log(self):
+        """Close the agent log handle, if open"""
+        if self._log_fd:
+            self._log_fd.close()
+            self._log_fd = None
+    
+    async def kill_existing_agents(self):
+        """Kill the process group of an agent left over from a previous run"""
+        try:
+            pid = int(self.pid_file.read_text())
+        except (FileNotFoundError, ValueError):
+            return  # No agent recorded
+        
+        try:
+            proc = psutil.Process(pid)
+            # Guard against the PID having been reused by an unrelated process
+            if 'spawn_agent.py' not in ' '.join(proc.cmdline()):
+                return
+            logger.info(f"🔧 Killing existing agent process: {pid}")
+            self._signal_agent(proc, signal.SIGTERM)
+            try:
+                await asyncio.to_thread(proc.wait, 2)
+            except psutil.TimeoutExpired:
+                self._signal_agent(proc, signal.SIGKILL)
                 try:
-                    if proc.info['cmdline'] and 'spawn_agent.py' in ' '.join(proc.info['cmdline']):
-                        logger.info(f"🔧 Killing existing agent process: {proc.info['pid']}")
-                        proc.kill()
-                        proc.wait(timeout=5)
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.TimeoutExpired):
-                    pass
+                    await asyncio.to_thread(proc.wait, 2)
+                except psutil.TimeoutExpired:
+                    logger.warning(f"⚠️ Existing agent {pid} is still alive after SIGKILL")
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
         except Exception as e:
-            logger.warning(f"⚠️ Error killing existing agents: {e}")
+            logger.warning(f"⚠️ Error killing existing agent: {e}")
+    
+    def _signal_agent(self, proc, sig):
+        """Signal an agent and, if it leads its own process group, everything it spawned"""
+        try:
+            if os.getpgid(proc.pid) == proc.pid:
+                os.killpg(proc.pid, sig)
+            else:
+                # Started without its own session (e.g. by an older supervisor)
+                proc.send_signal(sig)
+        except (ProcessLookupError, psutil.NoSuchProcess):
+            pass  # Already gone
     
     def is_agent_healthy(self):
         """Check if the agent process is healthy"""
         if not self.agent_process:
             return False
             
-        # Check if process is still running
-        if self.agent_process.poll() is not None:
+        # Check if process is still running; with a pidfd, exit is reported by _on_agent_death
+        if self._agent_dead:
+            return False
+        if self._pidfd is None and self.agent_process.poll() is not None:
             logger.warning("⚠️ Agent process has terminated")
             return False
         
         try:
             # Check memory usage
-            process = psutil.Process(self.agent_process.pid)
-            memory_mb = process.memory_info().rss / 1024 / 1024
+            process = self._ps_proc
+            if process is None:
+                process = self._ps_proc = psutil.Process(self.agent_process.pid)
+            # oneshot() parses /proc/<pid>/stat once for both reads
+            with process.oneshot():
+                status = process.status()
+                num_threads = process.num_threads()
+            if _PAGE_SIZE is not None:
+                memory_mb = _fast_rss_mb(process.pid)
+            else:
+                memory_mb = process.memory_info().rss / 1024 / 1024
+            
+            if status == psutil.STATUS_ZOMBIE:
+                logger.warning("⚠️ Agent process is a zombie")
+                return False
             
             if memory_mb > self.max_memory_mb:
                 logger.warning(f"⚠️ Agent memory usage too high: {memory_mb:.1f}MB > {self.max_memory_mb}MB")
                 return False
             
             # Check log file activity
-            if os.path.exists(self.log_file):
-                log_age = time.time() - os.path.getmtime(self.log_file)
+            if self._last_log_activity is not None:
+                log_age = time.time() - self._last_log_activity
                 if log_age > self.max_silent_time:
                     logger.warning(f"⚠️ Agent log inactive for {log_age:.1f}s > {self.max_silent_time}s")
                     return False
+            else:
+                try:
+                    log_age = time.time() - max(os.stat(self.log_file).st_mtime, self.last_restart_time)
+                except FileNotFoundError:
+                    log_age = None
+                if log_age is not None and log_age > self.max_silent_time:
+                    logger.warning(f"⚠️ Agent log inactive for {log_age:.1f}s > {self.max_silent_time}s")
+                    return False
             
-            logger.debug(f"✅ Agent healthy - PID: {self.agent_process.pid}, Memory: {memory_mb:.1f}MB")
+            logger.debug(f"✅ Agent healthy - PID: {self.agent_process.pid}, Memory: {memory_mb:.1f}MB, Threads: {num_threads}")
             return True
             
         except psutil.NoSuchProcess:
             logger.warning("⚠️ Agent process not found")
+            self._ps_proc = None
             return False
         except Exception as e:
             logger.warning(f"⚠️ Health check error: {e}")
             return False
     
-    def restart_agent(self):
+    async def restart_agent(self):
         """Restart the agent with exponential backoff"""
         if self.is_shutting_down:
             return False
@@ -159,47 +290,55 @@ class AgentSupervisor:
             logger.error(f"❌ Maximum restarts ({self.max_restarts}) reached. Stopping supervisor.")
             return False
         
+        # Crash-loop detection over integer ns timestamps; converted to seconds only for logging
+        now = time.monotonic_ns()
+        window_start = now - self.crash_loop_window * 1_000_000_000
+        restart_times = self._restart_times
+        while restart_times and restart_times[0] < window_start:
+            restart_times.popleft()
+        restart_times.append(now)
+        if len(restart_times) > self.crash_loop_restarts:
+            span = (now - restart_times[0]) / 1e9
+            logger.warning(f"⚠️ Crash loop: {len(restart_times)} restarts in {span:.0f}s, backing off {self.max_restart_delay}s")
+            self.restart_delay = self.max_restart_delay
+        
         # Emergency cleanup of any stale LiveKit connections
         try:
             logger.info("🧹 Performing emergency cleanup of LiveKit connections...")
-            import sys
             sys.path.append(str(Path(__file__).parent))
             from connection_manager import connection_manager
             
-            # Run emergency cleanup in a new event loop (since supervisor runs sync)
-            import asyncio
-            try:
-                loop = asyncio.get_event_loop()
-            except RuntimeError:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-            
-            loop.run_until_complete(connection_manager.emergency_cleanup())
+            await connection_manager.emergency_cleanup()
             logger.info("✅ Emergency cleanup completed")
         except Exception as e:
             logger.warning(f"⚠️ Emergency cleanup failed: {e}")
         
         # Stop current agent
-        if self.agent_process:
+        self._unwatch_agent()
+        if self.agent_process and self.agent_process.poll() is None:
             try:
                 logger.info(f"🛑 Stopping agent process: {self.agent_process.pid}")
-                self.agent_process.terminate()
-                self.agent_process.wait(timeout=10)
+                self._signal_agent(self.agent_process, signal.SIGTERM)
+                # Wait in a thread so health checks and watchers keep running
+                await asyncio.to_thread(self.agent_process.wait, 10)
             except subprocess.TimeoutExpired:
                 logger.warning("⚠️ Agent didn't stop gracefully, killing...")
-                self.agent_process.kill()
+                self._signal_agent(self.agent_process, signal.SIGKILL)
+                await asyncio.to_thread(self.agent_process.wait)
             except Exception as e:
                 logger.warning(f"⚠️ Error stopping agent: {e}")
+        self._ps_proc = None
+        self._close_log()
         
         # Wait with exponential backoff
         logger.info(f"⏳ Waiting {self.restart_delay}s before restart {self.restart_count}/{self.max_restarts}")
-        time.sleep(self.restart_delay)
+        await asyncio.sleep(self.restart_delay)
         
         # Increase delay for next restart (exponential backoff)
         self.restart_delay = min(self.restart_delay * 2, self.max_restart_delay)
         
         # Start new agent
-        success = self.start_agent()
+        success = await self.start_agent()
         
         if success:
             # Reset delay on successful start
@@ -210,23 +349,52 @@ class AgentSupervisor:
             
         return success
     
+    def _record_log_activity(self, timestamp):
+        """track_writes callback; activity before the current agent's spawn is ignored"""
+        if timestamp is None:
+            self._last_log_activity = None  # Watcher died: health checks go back to stat()
+        else:
+            self._last_log_activity = max(timestamp, self.last_restart_time)
+    
     async def monitor_loop(self):
         """Main monitoring loop"""
         logger.info("🎯 Agent supervisor started")
         
         # Initial agent start
-        if not self.start_agent():
+        if not await self.start_agent():
             logger.error("❌ Failed to start agent initially")
             return
         
+        if awatch is not None:
+            self._log_watch_task = asyncio.create_task(track_writes(self.log_file, self._record_log_activity))
+        
+        # Health checks only request restarts; a single worker performs them
+        health_task = asyncio.create_task(self._health_loop())
+        restart_task = asyncio.create_task(self._restart_worker())
+        try:
+            await asyncio.wait({health_task, restart_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            health_task.cancel()
+            restart_task.cancel()
+    
+    def request_restart(self, reason):
+        """Queue an agent restart; dropped if one is already pending"""
+        try:
+            self._restart_q.put_nowait(reason)
+        except asyncio.QueueFull:
+            logger.debug(f"Restart already pending, dropping: {reason}")
+    
+    async def _health_loop(self):
+        """Periodically check agent health and request restarts"""
         while not self.is_shutting_down:
             try:
-                await asyncio.sleep(self.health_check_interval)
+                await asyncio.sleep(self._health_check_interval)
                 
-                if not self.is_agent_healthy():
-                    logger.warning("🔄 Agent unhealthy, restarting...")
-                    if not self.restart_agent():
-                        break
+                if self.is_agent_healthy():
+                    self._health_check_interval = min(self._health_check_interval * 1.3, self.max_health_check_interval)
+                else:
+                    self._health_check_interval = self.min_health_check_interval
+                    self.request_restart("Agent unhealthy")
                         
             except asyncio.CancelledError:
                 logger.info("🛑 Monitor loop cancelled")
@@ -235,22 +403,43 @@ class AgentSupervisor:
                 logger.error(f"❌ Monitor loop error: {e}")
                 await asyncio.sleep(5)  # Brief pause before continuing
     
+    async def _restart_worker(self):
+        """Perform queued restarts one at a time; returns when restarting fails"""
+        while not self.is_shutting_down:
+            reason = await self._restart_q.get()
+            logger.warning(f"🔄 {reason}, restarting...")
+            if not await self.restart_agent():
+                return
+            # Requests queued during the restart were about the old process
+            while not self._restart_q.empty():
+                self._restart_q.get_nowait()
+    
     def shutdown(self):
-        """Graceful shutdown"""
+        """Graceful shutdown; safe to call more than once"""
+        if self.is_shutting_down:
+            return
         logger.info("🛑 Shutting down supervisor...")
         self.is_shutting_down = True
         
-        if self.agent_process:
+        if self._log_watch_task:
+            self._log_watch_task.cancel()
+        
+        self._unwatch_agent()
+        # poll() reaps an exited agent, so its PID is never signalled after reuse
+        if self.agent_process and self.agent_process.poll() is None:
             try:
                 logger.info("🛑 Stopping agent process...")
-                self.agent_process.terminate()
+                self._signal_agent(self.agent_process, signal.SIGTERM)
                 self.agent_process.wait(timeout=10)
                 logger.info("✅ Agent stopped gracefully")
             except subprocess.TimeoutExpired:
                 logger.warning("⚠️ Force killing agent...")
-                self.agent_process.kill()
+                self._signal_agent(self.agent_process, signal.SIGKILL)
+                self.agent_process.wait()
             except Exception as e:
                 logger.error(f"❌ Error stopping agent: {e}")
+        self._ps_proc = None
+        self._close_log()
 
 # Signal handlers
 supervisor = None
@@ -9,6 +9,9 @@
  * - UI state management
  */
 
+// Latency samples kept for averages and statistics
+const MAX_LATENCY_MEASUREMENTS = 20;
+
 class App {
     constructor() {
         this.room = null;
@@ -24,7 +27,11 @@ class App {
 
         // Mouth-to-ear latency tracking
         this.speechStartTime = null;
+        // Last MAX_LATENCY_MEASUREMENTS samples, overwritten in place once full (unordered)
         this.latencyMeasurements = [];
+        this.latencyIndex = 0;
+        this.latencySum = 0;
+        this.latencySampleCount = 0; // total samples ever recorded; drives display cadence
         this.isWaitingForEcho = false;
         this.testCount = 0;
         this.isRunningLatencyTest = false;
@@ -265,13 +272,8 @@ class App {
             const echoTime = Date.now();
             const latency = echoTime - this.speechStartTime;
 
-            // Record latency measurement
-            this.latencyMeasurements.push(latency);
-
-            // Calculate average latency
-            const avgLatency = Math.round(
-                this.latencyMeasurements.reduce((a, b) => a + b, 0) / this.latencyMeasurements.length
-            );
+            // Record latency measurement and get the running average
+            const avgLatency = this.recordLatency(latency);
 
             // Enhanced terminal logging
             this.testCount++;
@@ -324,7 +326,7 @@ class App {
             }
 
             // Show detailed latency statistics every 3 measurements
-            if (this.latencyMeasurements.length % 3 === 0) {
+            if (this.latencySampleCount % 3 === 0) {
                 this.showLatencyStatistics();
             }
 
@@ -552,7 +554,9 @@ class App {
         // Data channel for tracking agent processing state
         this.room.on(LivekitClient.RoomEvent.DataReceived, (payload, participant) => {
             try {
-                const data = JSON.parse(new TextDecoder().decode(payload));
+                const text = new TextDecoder().decode(payload);
+                // JSON messages start with '{'; anything else is a base64 binary packet
+                const data = text.startsWith('{') ? JSON.parse(text) : this.decodeAgentPacket(text);
                 console.log('📡 Received data from agent:', data);
                 this.handleAgentData(data);
             } catch (error) {
@@ -859,6 +863,24 @@ class App {
         }
     }
 
+    /**
+     * Record a latency sample and return the rounded average of the kept samples.
+     * Keeps a running sum so neither eviction nor averaging rescans the window.
+     */
+    recordLatency(latency) {
+        if (this.latencyMeasurements.length === MAX_LATENCY_MEASUREMENTS) {
+            this.latencySum -= this.latencyMeasurements[this.latencyIndex];
+            this.latencyMeasurements[this.latencyIndex] = latency;
+        } else {
+            this.latencyMeasurements.push(latency);
+        }
+        this.latencyIndex = (this.latencyIndex + 1) % MAX_LATENCY_MEASUREMENTS;
+        this.latencySum += latency;
+        this.latencySampleCount++;
+
+        return Math.round(this.latencySum / this.latencyMeasurements.length);
+    }
+
     /**
      * Show detailed latency statistics
      */
@@ -886,6 +908,27 @@ class App {
                  percentage >= 80 ? 'success' : 'warning');
     }
 
+    /**
+     * Decode a base64 binary packet from the agent.
+     * Latency update layout (little-endian): u8 type, f32 latency_ms, f64 timestamp, u32 response_count
+     */
+    decodeAgentPacket(text) {
+        const bytes = Uint8Array.from(atob(text), c => c.charCodeAt(0));
+        const view = new DataView(bytes.buffer);
+
+        switch (view.getUint8(0)) {
+            case 1:
+                return {
+                    type: 'latency_update',
+                    latency_ms: view.getFloat32(1, true),
+                    timestamp: view.getFloat64(5, true),
+                    response_count: view.getUint32(13, true)
+                };
+            default:
+                throw new Error(`Unknown agent packet type ${view.getUint8(0)}`);
+        }
+    }
+
     /**
      * Handle data from agent (processing state, latency tracking)
      */
@@ -918,12 +961,7 @@ class App {
                     console.log(`🎯 Server-side latency measurement: ${latency}ms (avg: ${avgLatency}ms)`);
                     
                     // Store in our measurements for consistency with client-side tracking
-                    this.latencyMeasurements.push(latency);
-                    
-                    // Keep only last 20 measurements
-                    if (this.latencyMeasurements.length > 20) {
-                        this.latencyMeasurements.shift();
-                    }
+                    this.recordLatency(latency);
                     
                     this.log(`✅ Response complete! End-to-end latency: ${latency}ms (avg: ${avgLatency}ms)`, 'success');
                     
@@ -948,11 +986,11 @@ class App {
                     // Update measurement count display if available
                     const measurementElement = document.getElementById('measurementCount');
                     if (measurementElement) {
-                        measurementElement.textContent = `${data.measurement_count || this.latencyMeasurements.length}`;
+                        measurementElement.textContent = `${data.measurement_count || this.latencySampleCount}`;
                     }
                     
                     // Show latency statistics every few measurements
-                    if (this.latencyMeasurements.length % 3 === 0) {
+                    if (this.latencySampleCount % 3 === 0) {
                         this.showLatencyStatistics();
                     }
                 }
@@ -966,18 +1004,8 @@ class App {
                     
                     console.log(`📊 Real-time latency measurement: ${latency}ms`);
                     
-                    // Store the measurement
-                    this.latencyMeasurements.push(latency);
-                    
-                    // Keep only last 20 measurements
-                    if (this.latencyMeasurements.length > 20) {
-                        this.latencyMeasurements.shift();
-                    }
-                    
-                    // Calculate running average
-                    const avgLatency = Math.round(
-                        this.latencyMeasurements.reduce((a, b) => a + b, 0) / this.latencyMeasurements.length
-                    );
+                    // Store the measurement and get the running average
+                    const avgLatency = this.recordLatency(latency);
                     
                     this.log(`📊 Latency: ${latency}ms (avg: ${avgLatency}ms from ${this.latencyMeasurements.length} measurements)`, 'info');
                     
@@ -1010,7 +1038,7 @@ class App {
                     }
                     
                     // Show detailed statistics every few measurements
-                    if (this.latencyMeasurements.length % 5 === 0) {
+                    if (this.latencySampleCount % 5 === 0) {
                         this.showLatencyStatistics();
                     }
                 }
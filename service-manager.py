@@ -28,10 +28,16 @@ import logging
 import json
 import aiohttp
 import docker
+from collections import defaultdict
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
 import psutil
 
+# .env, log and watcher helpers are shared with the agent supervisor
+sys.path.insert(0, str(Path(__file__).parent / 'agent'))
+from service_utils import awatch, open_child_log, parse_env, track_writes
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -43,11 +49,41 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@dataclass(frozen=True, slots=True)
+class ServiceConfig:
+    """How to start and health-check one managed service"""
+    name: str
+    type: str  # 'docker' or 'process'
+    health_check: Callable[[], Awaitable[bool]]
+    port: Optional[int] = None
+    startup_time: float = 2.0  # expected seconds until healthy
+    depends_on: Tuple[str, ...] = ()
+    container_name: Optional[str] = None  # docker services
+    command: Tuple[str, ...] = ()  # process services
+    cwd: Optional[Path] = None  # process services
+
 class ServiceManager:
     def __init__(self):
         self.project_dir = Path(__file__).parent
         self.is_shutting_down = False
         self.services = {}
+        self.min_health_check_interval = 5  # Check every 5 seconds after a failure...
+        self.max_health_check_interval = 60  # ...backing off to once a minute while healthy
+        
+        # Restart rate limiting, per service
+        self.min_restart_backoff = 5  # seconds between restarts of the same service...
+        self.max_restart_backoff = 60  # ...doubling with each restart up to a minute
+        self.restart_backoff_reset = 300  # reset once a service has stayed healthy for 5 minutes
+        self._restart_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+        self._last_restart: Dict[str, float] = {}
+        self._restart_backoff: Dict[str, float] = {}
+        self._healthy_since: Dict[str, float] = {}  # start of each service's current healthy streak
+        self._env_cache: Dict[str, str] = {}  # parsed .env contents
+        self._env_mtime: Optional[float] = None
+        self._http_session: Optional[aiohttp.ClientSession] = None  # created on first health check
+        self.agent_log_file = Path('/tmp/pipecat_agent.log')
+        self._last_agent_log_activity: Optional[float] = None  # updated via track_writes
+        self._log_watch_task: Optional[asyncio.Task] = None
         
         # Docker client
         try:
@@ -56,39 +92,44 @@ class ServiceManager:
             logger.error(f"Failed to connect to Docker: {e}")
             sys.exit(1)
             
-        # Service configurations
-        self.service_configs = {
-            'livekit': {
-                'type': 'docker',
-                'container_name': 'livekit-pipecat-demo-livekit-1',
-                'health_check': self.check_livekit_health,
-                'port': 7880,
-                'startup_time': 5
-            },
-            'redis': {
-                'type': 'docker', 
-                'container_name': 'livekit-pipecat-demo-redis-1',
-                'health_check': self.check_redis_health,
-                'port': 6379,
-                'startup_time': 2
-            },
-            'http_server': {
-                'type': 'process',
-                'command': [sys.executable, '-m', 'http.server', '8000'],
-                'cwd': self.project_dir / 'client',
-                'health_check': self.check_http_health,
-                'port': 8000,
-                'startup_time': 2
-            },
-            'agent': {
-                'type': 'process',
-                'command': [sys.executable, 'supervisor.py'],
-                'cwd': self.project_dir / 'agent', 
-                'health_check': self.check_agent_health,
-                'startup_time': 5,
-                'depends_on': ['livekit', 'redis']
-            }
-        }
+        # Service configurations, in definition order
+        self.services_list = (
+            ServiceConfig(
+                name='livekit',
+                type='docker',
+                container_name='livekit-pipecat-demo-livekit-1',
+                health_check=self.check_livekit_health,
+                port=7880,
+                startup_time=5
+            ),
+            ServiceConfig(
+                name='redis',
+                type='docker',
+                container_name='livekit-pipecat-demo-redis-1',
+                health_check=self.check_redis_health,
+                port=6379,
+                startup_time=2
+            ),
+            ServiceConfig(
+                name='http_server',
+                type='process',
+                command=(sys.executable, '-m', 'http.server', '8000'),
+                cwd=self.project_dir / 'client',
+                health_check=self.check_http_health,
+                port=8000,
+                startup_time=2
+            ),
+            ServiceConfig(
+                name='agent',
+                type='process',
+                command=(sys.executable, 'supervisor.py'),
+                cwd=self.project_dir / 'agent',
+                health_check=self.check_agent_health,
+                startup_time=15,  # supervisor + pipecat imports before the agent's first log line
+                depends_on=('livekit', 'redis')
+            ),
+        )
+        self.service_configs: Dict[str, ServiceConfig] = {config.name: config for config in self.services_list}
 
     async def start_all_services(self):
         """Start all services in dependency order"""
@@ -113,17 +154,19 @@ class ServiceManager:
         return True
     
     def load_environment(self):
-        """Load environment variables from .env file"""
+        """Load environment variables from .env file, re-parsing only when it changed"""
         env_file = self.project_dir / '.env'
-        if env_file.exists():
-            with open(env_file) as f:
-                for line in f:
-                    if line.strip() and not line.startswith('#') and '=' in line:
-                        key, value = line.strip().split('=', 1)
-                        os.environ[key] = value
-            logger.info("✅ Environment variables loaded")
-        else:
+        try:
+            mtime = env_file.stat().st_mtime
+        except FileNotFoundError:
             logger.warning("⚠️ .env file not found")
+            return
+        
+        if mtime != self._env_mtime:
+            self._env_cache = parse_env(env_file)
+            self._env_mtime = mtime
+        os.environ.update(self._env_cache)
+        logger.info("✅ Environment variables loaded")
 
     def check_prerequisites(self) -> bool:
         """Check if all prerequisites are met"""
@@ -160,38 +203,38 @@ class ServiceManager:
         config = self.service_configs[service_name]
         
         # Check dependencies
-        if 'depends_on' in config:
-            for dep in config['depends_on']:
-                if not await self.is_service_healthy(dep):
-                    logger.error(f"❌ Dependency {dep} not healthy for {service_name}")
-                    return False
+        for dep in config.depends_on:
+            if not await self.is_service_healthy(dep):
+                logger.error(f"❌ Dependency {dep} not healthy for {service_name}")
+                return False
         
         logger.info(f"🚀 Starting {service_name}...")
         
-        if config['type'] == 'docker':
+        if config.type == 'docker':
             return await self.start_docker_service(service_name)
-        elif config['type'] == 'process':
+        elif config.type == 'process':
             return await self.start_process_service(service_name)
             
         return False
 
     async def start_docker_service(self, service_name: str) -> bool:
         """Start a Docker service"""
+        config = self.service_configs[service_name]
         try:
-            # Use docker-compose to ensure all settings are correct
-            cmd = ['docker-compose', 'up', '-d', service_name]
-            result = subprocess.run(cmd, cwd=self.project_dir, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                logger.error(f"❌ Failed to start {service_name}: {result.stderr}")
-                return False
+            try:
+                # Start the existing container directly over the Docker API
+                container = await asyncio.to_thread(self.docker_client.containers.get, config.container_name)
+                await asyncio.to_thread(container.start)
+            except docker.errors.NotFound:
+                # First run: let docker-compose create the container with the right settings
+                returncode, stderr = await self.run_docker_compose('up', '-d', service_name)
                 
-            # Wait for startup
-            config = self.service_configs[service_name]
-            await asyncio.sleep(config['startup_time'])
-            
-            # Health check
-            if await self.is_service_healthy(service_name):
+                if returncode != 0:
+                    logger.error(f"❌ Failed to start {service_name}: {stderr}")
+                    return False
+                
+            # Wait until healthy, giving up after twice the expected startup time
+            if await self._wait_until_healthy(service_name, config.startup_time * 2):
                 logger.info(f"✅ {service_name} started successfully")
                 return True
             else:
@@ -202,31 +245,48 @@ class ServiceManager:
             logger.error(f"❌ Error starting {service_name}: {e}")
             return False
 
+    async def run_docker_compose(self, *args: str) -> tuple:
+        """Run a docker-compose command without blocking the event loop"""
+        proc = await asyncio.create_subprocess_exec(
+            'docker-compose', *args,
+            cwd=self.project_dir,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await proc.communicate()
+        return proc.returncode, stderr.decode(errors='replace')
+
     async def start_process_service(self, service_name: str) -> bool:
         """Start a process service"""
         config = self.service_configs[service_name]
         
         try:
+            # Send output to a file: nothing reads a PIPE, so a full pipe would stall the child
+            log_fd = open_child_log(f'/tmp/service_manager_{service_name}.log')
+            
             # Start process
-            process = subprocess.Popen(
-                config['command'],
-                cwd=config['cwd'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                env=os.environ.copy()
-            )
+            try:
+                process = subprocess.Popen(
+                    config.command,
+                    cwd=config.cwd,
+                    stdout=log_fd,
+                    stderr=subprocess.STDOUT,
+                    env=os.environ.copy()
+                )
+            except Exception:
+                log_fd.close()
+                raise
             
             self.services[service_name] = {
                 'type': 'process',
                 'process': process,
+                'started_at': time.time(),
+                'log_fd': log_fd,
                 'config': config
             }
             
-            # Wait for startup
-            await asyncio.sleep(config['startup_time'])
-            
-            # Health check
-            if await self.is_service_healthy(service_name):
+            # Wait until healthy, giving up after twice the expected startup time
+            if await self._wait_until_healthy(service_name, config.startup_time * 2):
                 logger.info(f"✅ {service_name} started successfully")
                 return True
             else:
@@ -237,22 +297,39 @@ class ServiceManager:
             logger.error(f"❌ Error starting {service_name}: {e}")
             return False
 
+    async def _wait_until_healthy(self, service_name: str, timeout: float) -> bool:
+        """Poll a service's health check until it passes or the timeout expires"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if await self.is_service_healthy(service_name):
+                return True
+            await asyncio.sleep(0.1)
+        return False
+
     async def is_service_healthy(self, service_name: str) -> bool:
         """Check if a service is healthy"""
         config = self.service_configs[service_name]
         
         try:
-            return await config['health_check']()
+            return await config.health_check()
         except Exception as e:
             logger.debug(f"Health check failed for {service_name}: {e}")
             return False
 
+    def get_http_session(self) -> aiohttp.ClientSession:
+        """Shared HTTP session, so health checks reuse keep-alive connections"""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=5),
+                connector=aiohttp.TCPConnector(limit=8, keepalive_timeout=60)
+            )
+        return self._http_session
+
     async def check_livekit_health(self) -> bool:
         """Check LiveKit server health"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get('http://localhost:7880') as resp:
-                    return resp.status in [200, 404]  # 404 is OK for LiveKit
+            async with self.get_http_session().get('http://localhost:7880') as resp:
+                return resp.status in [200, 404]  # 404 is OK for LiveKit
         except:
             return False
 
@@ -267,9 +344,8 @@ class ServiceManager:
     async def check_http_health(self) -> bool:
         """Check HTTP server health"""
         try:
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
-                async with session.get('http://localhost:8000') as resp:
-                    return resp.status == 200
+            async with self.get_http_session().get('http://localhost:8000') as resp:
+                return resp.status == 200
         except:
             return False
 
@@ -277,32 +353,65 @@ class ServiceManager:
         """Check agent health"""
         try:
             # Check if supervisor process is running
+            started_at = 0.0
             if 'agent' in self.services:
                 process = self.services['agent']['process']
                 if process.poll() is not None:
                     return False
+                started_at = self.services['agent']['started_at']
                     
             # Check if agent log has recent activity
-            log_file = Path('/tmp/pipecat_agent.log')
-            if log_file.exists():
-                age = time.time() - log_file.stat().st_mtime
-                return age < 300  # Log activity within 5 minutes
-            return False
+            last_activity = self._last_agent_log_activity
+            if last_activity is None:
+                try:
+                    last_activity = os.stat(self.agent_log_file).st_mtime
+                except FileNotFoundError:
+                    return False
+            # Writes left by a previous run don't count: the agent we started must have logged
+            if last_activity < started_at:
+                return False
+            return time.time() - last_activity < 300  # Log activity within 5 minutes
         except:
             return False
 
+    def _record_agent_log_activity(self, timestamp: Optional[float]):
+        """track_writes callback; None means the watcher stopped and mtime is used again"""
+        self._last_agent_log_activity = timestamp
+
     async def monitor_services(self):
         """Monitor all services and restart if needed"""
         logger.info("🔍 Starting service monitoring")
         
+        if awatch is not None and self.agent_log_file.exists():
+            self._log_watch_task = asyncio.create_task(
+                track_writes(self.agent_log_file, self._record_agent_log_activity)
+            )
+        
+        interval = self.min_health_check_interval
         while not self.is_shutting_down:
             try:
-                for service_name in self.service_configs.keys():
-                    if not await self.is_service_healthy(service_name):
+                # Check every service concurrently, then restart the unhealthy ones in order
+                results = await asyncio.gather(
+                    *[self.is_service_healthy(config.name) for config in self.services_list],
+                    return_exceptions=True
+                )
+                all_healthy = True
+                now = time.monotonic()
+                for config, healthy in zip(self.services_list, results):
+                    service_name = config.name
+                    if healthy is True:
+                        self._healthy_since.setdefault(service_name, now)
+                    else:
+                        all_healthy = False
                         logger.warning(f"⚠️ {service_name} unhealthy, restarting...")
                         await self.restart_service(service_name)
-                        
-                await asyncio.sleep(30)  # Check every 30 seconds
+                
+                # Back off while everything is green, snap back after any failure
+                if all_healthy:
+                    interval = min(interval * 1.3, self.max_health_check_interval)
+                else:
+                    interval = self.min_health_check_interval
+                await asyncio.sleep(interval)
                 
             except asyncio.CancelledError:
                 break
@@ -311,31 +420,54 @@ class ServiceManager:
                 await asyncio.sleep(5)
 
     async def restart_service(self, service_name: str):
-        """Restart a specific service"""
-        logger.info(f"🔄 Restarting {service_name}...")
-        
-        # Stop service first
-        await self.stop_service(service_name)
-        await asyncio.sleep(2)
-        
-        # Start service
-        if await self.start_service(service_name):
-            logger.info(f"✅ {service_name} restarted successfully")
-        else:
-            logger.error(f"❌ Failed to restart {service_name}")
+        """Restart a specific service, rate-limited by backoff"""
+        # monitor_services restarts one service at a time; the lock keeps a restart
+        # requested from anywhere else (e.g. a concurrent caller) from overlapping it
+        async with self._restart_locks[service_name]:
+            now = time.monotonic()
+            backoff = self._restart_backoff.get(service_name, self.min_restart_backoff)
+            # The healthy streak ends here, whether or not this attempt goes ahead
+            healthy_since = self._healthy_since.pop(service_name, None)
+            if healthy_since is not None and now - healthy_since > self.restart_backoff_reset:
+                backoff = self.min_restart_backoff  # Stayed healthy long enough, start over
+            last = self._last_restart.get(service_name)
+            if last is not None:
+                since_last = now - last
+                if since_last < backoff:
+                    logger.info(f"⏳ {service_name} restarted {since_last:.1f}s ago, backing off ({backoff}s)")
+                    return
+            self._last_restart[service_name] = now
+            
+            logger.info(f"🔄 Restarting {service_name}...")
+            
+            # Stop service first
+            await self.stop_service(service_name)
+            await asyncio.sleep(2)
+            
+            # Every restart before a full healthy streak means the service is flapping
+            # (or failing to start), so the next one has to wait twice as long
+            self._restart_backoff[service_name] = min(backoff * 2, self.max_restart_backoff)
+            
+            # Start service
+            if await self.start_service(service_name):
+                logger.info(f"✅ {service_name} restarted successfully")
+            else:
+                logger.error(f"❌ Failed to restart {service_name}")
 
     async def stop_service(self, service_name: str):
         """Stop a specific service"""
         config = self.service_configs[service_name]
         
-        if config['type'] == 'docker':
+        if config.type == 'docker':
             try:
-                subprocess.run(['docker-compose', 'stop', service_name], 
-                             cwd=self.project_dir, capture_output=True)
+                container = await asyncio.to_thread(self.docker_client.containers.get, config.container_name)
+                await asyncio.to_thread(container.stop)
+            except docker.errors.NotFound:
+                pass  # Nothing to stop
             except Exception as e:
                 logger.error(f"Error stopping {service_name}: {e}")
                 
-        elif config['type'] == 'process' and service_name in self.services:
+        elif config.type == 'process' and service_name in self.services:
             try:
                 process = self.services[service_name]['process']
                 process.terminate()
@@ -343,6 +475,7 @@ class ServiceManager:
                     process.wait(timeout=10)
                 except subprocess.TimeoutExpired:
                     process.kill()
+                self.services[service_name]['log_fd'].close()
                 del self.services[service_name]
             except Exception as e:
                 logger.error(f"Error stopping {service_name}: {e}")
@@ -352,19 +485,24 @@ class ServiceManager:
         logger.info("🛑 Stopping all services...")
         self.is_shutting_down = True
         
-        # Stop in reverse order
-        stop_order = ['agent', 'http_server', 'livekit', 'redis']
+        if self._log_watch_task:
+            self._log_watch_task.cancel()
         
-        for service_name in stop_order:
+        # Stop in reverse order; the docker services don't depend on each other
+        for service_name in ['agent', 'http_server']:
             await self.stop_service(service_name)
+        await asyncio.gather(self.stop_service('livekit'), self.stop_service('redis'))
             
         # Stop docker-compose
         try:
-            subprocess.run(['docker-compose', 'down'], 
-                         cwd=self.project_dir, capture_output=True)
+            await self.run_docker_compose('down')
         except Exception as e:
             logger.error(f"Error stopping docker-compose: {e}")
             
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+            
         logger.info("✅ All services stopped")
 
     async def show_status(self):
@@ -373,13 +511,14 @@ class ServiceManager:
         print("📊 SERVICE STATUS")
         print("="*50)
         
-        for service_name, config in self.service_configs.items():
+        for config in self.services_list:
+            service_name = config.name
             try:
                 is_healthy = await self.is_service_healthy(service_name)
                 status = "🟢 Running" if is_healthy else "🔴 Stopped"
                 
-                if 'port' in config:
-                    print(f"{service_name:12} {status} (port {config['port']})")
+                if config.port is not None:
+                    print(f"{service_name:12} {status} (port {config.port})")
                 else:
                     print(f"{service_name:12} {status}")
             except Exception as e:
@@ -2,6 +2,7 @@
 """
 Simple microphone test to check audio levels
 """
+import math
 import numpy as np
 import sounddevice as sd
 import time
@@ -23,8 +24,10 @@ def test_microphone():
     
     # Analyze audio levels
     audio_array = audio_data.flatten()
-    volume_level = np.sqrt(np.mean(audio_array**2))
-    max_amplitude = np.max(np.abs(audio_array))
+    # float32 halves memory traffic vs int64 and can't overflow like int16 squares
+    x = audio_array.astype(np.float32)
+    volume_level = math.sqrt(float(np.dot(x, x)) / x.size)
+    max_amplitude = int(np.abs(x).max())
     
     print("\n" + "="*50)
     print("📊 MICROPHONE TEST RESULTS:")